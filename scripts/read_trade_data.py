@@ -1,6 +1,7 @@
 """This file contains functions which can read data downloaded from CEPII, do some
-preprocessing and save to a feather file. It also contains functions to read the data
-as a pandas dataframe."""
+preprocessing and save to feather files. Running it also combines all years into a
+single parquet file. It also contains functions to read the data as a pandas
+dataframe."""
 
 from scripts.config import paths
 import pandas as pd
@@ -11,6 +12,13 @@ import numpy as np
 
 COUNTRY_CODES_FILE: str = "country_codes.csv"
 TRADE_FILE_NAME_PREFIX: str = "hs17_"
+STRING_COLUMNS: list = [
+    "exporter",
+    "importer",
+    "commodity_code",
+    "importer_continent",
+    "exporter_continent",
+]
 
 
 def _countries_dict() -> dict:
@@ -80,7 +88,9 @@ def baci2feather(year: int = 2020) -> None:
 
 def read_baci(year: int = 2020) -> pd.DataFrame:
     """Read the feather file for a specific year"""
-    return pd.read_feather(f"{paths.raw_data}/{TRADE_FILE_NAME_PREFIX}{year}.feather")
+    return pd.read_feather(
+        f"{paths.raw_data}/{TRADE_FILE_NAME_PREFIX}{year}.feather"
+    ).astype({c: "string[pyarrow]" for c in STRING_COLUMNS})
 
 
 def filter_africa(df: pd.DataFrame, imp_exp: str = "exporter") -> pd.DataFrame:
@@ -131,4 +141,12 @@ if __name__ == "__main__":
     [baci2feather(year) for year in range(2018, 2021)]
 
     df = pd.concat([read_baci(year) for year in range(2018, 2021)], ignore_index=True)
-    df.to_feather(f"{paths.raw_data}/baci_full.feather")
+
+    # Sorting by commodity code keeps each code in few row groups, so readers that
+    # filter on commodities can skip most of the file
+    df.sort_values(["commodity_code", "year"], ignore_index=True).to_parquet(
+        f"{paths.raw_data}/baci_full.parquet",
+        compression="zstd",
+        row_group_size=100_000,
+        index=False,
+    )
@@ -24,7 +24,7 @@ def commodity_exports_by_continent(data) -> pd.DataFrame:
     return (
         tc.exports_no_intra_europe(data)
         .pipe(tc.summarise_commodity_source_share, "cat2")
-        .groupby(["year", "exporter_name", "cat2"], as_index=False)["value"]
+        .groupby(["year", "exporter_name", "cat2"], as_index=False, sort=False)["value"]
         .sum()
         .assign(
             share=lambda d: round(
@@ -168,14 +168,14 @@ def flourish_commodity_explorer() -> None:
         )
         .merge(
             debt_stocks.rename(columns={"value": "Debt Stocks"})
-            .groupby("iso_code", as_index=False)["Debt Stocks"]
+            .groupby("iso_code", as_index=False, sort=False)["Debt Stocks"]
             .sum(),
             on="iso_code",
             how="outer",
         )
         .merge(
             debt_service.rename(columns={"value": "Debt Service"})
-            .groupby("iso_code", as_index=False)["Debt Service"]
+            .groupby("iso_code", as_index=False, sort=False)["Debt Service"]
             .sum(),
             on="iso_code",
             how="outer",
@@ -2,8 +2,10 @@
 Functions to manipulate trade data.
 """
 
+from functools import lru_cache
+
 import pandas as pd
-from scripts import codes
+from scripts import codes, utils
 
 from scripts.config import paths
 
@@ -30,19 +32,16 @@ def simplify_codes(df: pd.DataFrame) -> pd.DataFrame:
         | codes.potash_dict()
     )
 
-    # Create an empty dictionary for HS6 -> bec codes
-    bec: dict = {}
+    # Create a dictionary of HS6 -> bec category names
+    names: dict = codes.bec_names()
+    bec: dict = {k: names[v] for k, v in codes.codes_dict_bec().items()}
 
-    # Loop through all the HS6 codes to create a dictionary of HS6 -> bec codes
-    # which keeps the detailed specified by 'cc' but groups the rest
-    for k, v in codes.codes_dict_bec().items():
-        if k not in cat:
-            cat[k] = codes.bec_names()[v]
-        bec[k] = codes.bec_names()[v]
+    # Keep the detail specified by 'cat' but group the rest by bec category
+    cat = bec | cat
 
     # Add two columns: 'cat1' for basic bec groupings and 'cat2' for detailed + bec.
-    df["cat1"] = df.commodity_code.map(bec)
-    df["cat2"] = df.commodity_code.map(cat)
+    df["cat1"] = utils.map_unique(df.commodity_code, bec)
+    df["cat2"] = utils.map_unique(df.commodity_code, cat)
 
     return df
 
@@ -65,7 +64,7 @@ def simplify_exporter(
     # grouper
     grouper = [c for c in df.columns if c not in ["value"]]
 
-    return df.groupby(grouper, as_index=False).sum().reset_index(drop=True)
+    return df.groupby(grouper, as_index=False, sort=False).sum().reset_index(drop=True)
 
 
 def group_by_category(df: pd.DataFrame, category_col: str) -> pd.DataFrame:
@@ -81,6 +80,7 @@ def group_by_category(df: pd.DataFrame, category_col: str) -> pd.DataFrame:
                 category_col,
             ],
             as_index=False,
+            sort=False,
         )["value"]
         .sum()
         .sort_values(["exporter", "value"], ascending=(True, False))
@@ -95,12 +95,13 @@ def average_yearly(df: pd.DataFrame) -> pd.DataFrame:
     years: str = f"{df.year.min()}-{df.year.max()}"
 
     return (
-        df.groupby(grouper, as_index=False)["value"]
+        df.groupby(grouper, as_index=False, sort=False)["value"]
         .sum()
         .assign(value=lambda d: round(d.value / num_years, 4), year=years)
     )
 
 
+@lru_cache(maxsize=1)
 def gdp_dict() -> dict:
     return (
         pd.read_csv(paths.raw_data + rf"/{GDP_FILE_NAME}")
@@ -109,6 +110,7 @@ def gdp_dict() -> dict:
     )
 
 
+@lru_cache(maxsize=1)
 def eu_27_dict() -> dict:
     import country_converter as coco
 
@@ -124,13 +126,16 @@ def summarise_commodity_source_share(
     """Calculate the share of total that a source represents for each commodity"""
 
     total: dict = (
-        df.groupby(["year", "importer_name", commodity_column]).value.sum().to_dict()
+        df.groupby(["year", "importer_name", commodity_column], sort=False)
+        .value.sum()
+        .to_dict()
     )
 
     return (
         df.groupby(
             ["year", "exporter_name", "importer", "importer_name", commodity_column],
             as_index=False,
+            sort=False,
         )
         .value.sum()
         .assign(
@@ -157,8 +162,18 @@ def add_country_names(
     if columns is None:
         columns = ["importer", "exporter"]
 
+    # Convert the codes of all the columns in a single pass
+    iso_codes = list(pd.concat([df[c] for c in columns]).unique())
+    names = cc.convert(iso_codes, to="short_name", not_found=grouping_name)
+
+    # country_converter returns a string when converting a single code
+    if isinstance(names, str):
+        names = [names]
+
+    lookup: dict = dict(zip(iso_codes, names))
+
     for c in columns:
-        df[f"{c}_name"] = cc.convert(df[c], to="short_name", not_found=grouping_name)
+        df[f"{c}_name"] = utils.map_unique(df[c], lookup)
 
     return df
 
@@ -201,20 +216,11 @@ def exporters_to_africa(
     data to show the African continent as the target."""
 
     df = (
-        data.filter(
-            [
-                "year",
-                "exporter_name",
-                "exporter_continent",
-                "importer_continent",
-                "value",
-            ],
-            axis=1,
-        )
-        .groupby(
+        data.groupby(
             ["year", "exporter_name", "exporter_continent", "importer_continent"],
             as_index=False,
-        )
+            sort=False,
+        )["value"]
         .sum()
         .assign(step_from=step_from, step_to=step_to)
         .rename(columns={"exporter_name": "source", "importer_continent": "target"})
@@ -258,20 +264,11 @@ def exporters_to_african_countries(
     data to show exports to each individual African country."""
 
     df = (
-        data.filter(
-            [
-                "year",
-                "exporter_name",
-                "exporter_continent",
-                "importer_name",
-                "value",
-            ],
-            axis=1,
-        )
-        .groupby(
+        data.groupby(
             ["year", "exporter_name", "exporter_continent", "importer_name"],
             as_index=False,
-        )
+            sort=False,
+        )["value"]
         .sum()
         .assign(step_from=step_from, step_to=step_to)
         .rename(columns={"exporter_name": "source", "importer_name": "target"})
@@ -319,8 +316,9 @@ def africa_to_categories(
 
     df = (
         data.loc[lambda d: d.exporter != "Rest of the World"]
-        .filter(["year", "importer_continent", "cat2", "value"], axis=1)
-        .groupby(["year", "importer_continent", "cat2"], as_index=False)
+        .groupby(["year", "importer_continent", "cat2"], as_index=False, sort=False)[
+            "value"
+        ]
         .sum()
         .assign(step_from=step_from, step_to=step_to)
         .assign(
@@ -357,8 +355,11 @@ def exporter_to_categories(
     the commodity categories as the target."""
 
     df = (
-        data.filter(["year", "exporter", "importer_continent", "cat2", "value"], axis=1)
-        .groupby(["year", "exporter", "importer_continent", "cat2"], as_index=False)
+        data.groupby(
+            ["year", "exporter", "importer_continent", "cat2"],
+            as_index=False,
+            sort=False,
+        )["value"]
         .sum()
         .assign(step_from=step_from, step_to=step_to)
         .assign(
@@ -400,8 +401,11 @@ def exporter_to_categories_by_importer(
     the commodity categories as the target."""
 
     df = (
-        data.filter(["year", "exporter_name", "importer_name", "cat2", "value"], axis=1)
-        .groupby(["year", "exporter_name", "importer_name", "cat2"], as_index=False)
+        data.groupby(
+            ["year", "exporter_name", "importer_name", "cat2"],
+            as_index=False,
+            sort=False,
+        )["value"]
         .sum()
         .assign(step_from=step_from, step_to=step_to)
         .assign(
@@ -1,5 +1,7 @@
 """This file contains functions to analyse the impact of rising commodity prices in the
 cost of net imports."""
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 from scripts.config import paths
@@ -10,52 +12,122 @@ from scripts.commodities_analysis import get_commodity_prices
 
 TO_BARRELS: float = 0.1364
 CRUDE_COUNTRIES = ["NGA", "AGO", "LBY", "DZA", "COG", "EGY"]
-
-
-def _read_raw_data():
+RAW_DATA_COLUMNS = [
+    "year",
+    "exporter",
+    "importer",
+    "commodity_code",
+    "importer_continent",
+    "exporter_continent",
+    "quantity",
+]
+CATEGORICAL_COLUMNS = [
+    "exporter",
+    "importer",
+    "commodity_code",
+    "importer_continent",
+    "exporter_continent",
+    "category",
+    "pink_sheet_commodity",
+]
+
+NET_IMPORTS_KEYS = ["year", "iso_code", "category", "pink_sheet_commodity"]
+
+# iso code -> short name, filled as codes are converted
+_COUNTRY_NAMES: dict = {}
+
+# Loaders decorated with lru_cache return shared objects, do not modify them in place
+
+
+def _read_raw_data(commodities_list: list | tuple | pd.Series) -> pd.DataFrame:
     """
-    Reads the data from the file and returns a dataframe.
+    Reads the data for the selected commodities from the file and returns a dataframe.
     """
-    return pd.read_feather(f"{paths.raw_data}/baci_full.feather")
+    return pd.read_parquet(
+        f"{paths.raw_data}/baci_full.parquet",
+        columns=RAW_DATA_COLUMNS,
+        filters=[("commodity_code", "in", list(commodities_list))],
+        read_dictionary=[c for c in RAW_DATA_COLUMNS if c in CATEGORICAL_COLUMNS],
+    )
 
 
+@lru_cache(maxsize=1)
 def _load_study_commodities():
     """Load the commodities for the study"""
     return pd.read_csv(f"{paths.raw_data}/codes_pink.csv", dtype={"code": str})
 
 
-def _filter_commodities(df, commodities_list: list | pd.Series):
-    """Filter the dataframe to keep only the commodities for study"""
-
-    return df.loc[lambda d: d.commodity_code.isin(commodities_list)].reset_index(
-        drop=True
-    )
+@lru_cache(maxsize=1)
+def _study_codes() -> tuple:
+    """Unique commodity codes for the study"""
+    return tuple(sorted(_load_study_commodities()["code"].astype(str).unique()))
 
 
-def _add_commodity_name_desc(df):
+def _add_commodity_name_desc(df, commodities: pd.DataFrame = None):
     """Add the commodity name and description"""
-    commodities = _load_study_commodities()
+    if commodities is None:
+        commodities = _load_study_commodities()
+
     return df.merge(commodities, how="left", left_on="commodity_code", right_on="code")
 
 
+def _to_categorical(df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """Convert columns to categoricals. By default these are the CATEGORICAL_COLUMNS
+    present in the dataframe"""
+    if columns is None:
+        columns = [c for c in CATEGORICAL_COLUMNS if c in df.columns]
+
+    df = df.astype({c: "category" for c in columns})
+
+    # Arrow dictionaries keep the order in which values were found. Sort the categories
+    # so that sorting on these columns stays alphabetical
+    return df.assign(
+        **{
+            c: df[c].cat.reorder_categories(df[c].cat.categories.sort_values())
+            for c in columns
+        }
+    )
+
+
+def _from_categorical(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert categorical columns back to the dtype of their categories"""
+    categorical = df.select_dtypes("category").columns
+
+    return df.astype({c: df[c].cat.categories.dtype for c in categorical})
+
+
 def _remove_intra_africa(df):
     """Remove intra-african trade - particularly important if showing aggregate
     African figures"""
     return df.loc[
-        lambda d: ~(
-            (d.importer_continent == "Africa") & (d.exporter_continent == "Africa")
-        )
-    ].reset_index(drop=True)
+        ~((df.importer_continent == "Africa") & (df.exporter_continent == "Africa"))
+    ]
 
 
 def _only_african_exports(df):
     """Filter a dataframe to keep only exports originating in African countries"""
-    return df.loc[df.exporter_continent == "Africa"].reset_index(drop=True)
+    return df.loc[df.exporter_continent == "Africa"]
 
 
 def _only_african_imports(df):
     """Filter a dataframe to keep only imports originating in African countries"""
-    return df.loc[df.importer_continent == "Africa"].reset_index(drop=True)
+    return df.loc[df.importer_continent == "Africa"]
+
+
+def _country_names(iso_codes: pd.Series) -> np.ndarray:
+    """Convert iso codes to short names"""
+
+    missing = [c for c in iso_codes.dropna().unique() if c not in _COUNTRY_NAMES]
+    if missing:
+        names = coco.convert(missing, to="short_name")
+
+        # country_converter returns a string rather than a list for a single code
+        if isinstance(names, str):
+            names = [names]
+
+        _COUNTRY_NAMES.update(zip(missing, names))
+
+    return utils.map_unique(iso_codes, _COUNTRY_NAMES)
 
 
 def _add_unit_cost(
@@ -80,9 +152,16 @@ def _yearly_average(df, exclude: list = None):
 
     grouper = [x for x in df.columns if x not in exclude]
 
+    # Only average the excluded value columns, not the year itself
+    values = [x for x in exclude if x != "year" and x in df.columns]
+
     years = f"{df.year.min()}-{df.year.max()} (mean)"
 
-    return df.groupby(grouper).mean(numeric_only=True).reset_index().assign(year=years)
+    return (
+        df.groupby(grouper, as_index=False, observed=True, sort=False)[values]
+        .mean()
+        .assign(year=years)
+    )
 
 
 def _calc_mean_prices(
@@ -93,8 +172,8 @@ def _calc_mean_prices(
         yearly_prices.loc[
             (yearly_prices.year >= start_year) & (yearly_prices.year <= end_year)
         ]
-        .groupby(["commodity"])
-        .mean(numeric_only=True)["value"]
+        .groupby(["commodity"], sort=False)["value"]
+        .mean()
         .to_dict()
     )
 
@@ -104,10 +183,12 @@ def read_filtered_grouped_data() -> pd.DataFrame:
     descriptions and aggregate by year, exporter, importer, and commodity.
     This includes changing oils from mt to barrels"""
 
+    commodities = _load_study_commodities()
+
     df = (
-        _read_raw_data()
-        .pipe(_filter_commodities, commodities_list=_load_study_commodities().code)
-        .pipe(_add_commodity_name_desc)
+        _read_raw_data(commodities_list=_study_codes())
+        .pipe(_add_commodity_name_desc, commodities=commodities)
+        .pipe(_to_categorical)
         .groupby(
             [
                 "year",
@@ -120,61 +201,62 @@ def read_filtered_grouped_data() -> pd.DataFrame:
                 "pink_sheet_commodity",
             ],
             as_index=False,
+            observed=True,
+            sort=False,
         )["quantity"]
         .sum(numeric_only=True)
     )
 
-    df.loc[df.category == "crude oil", "quantity"] = (
-        df.loc[df.category == "crude oil", "quantity"] / TO_BARRELS
-    )
+    # Convert crude oil to barrels in a single pass over the quantity column
+    is_crude = df["category"].eq("crude oil").to_numpy()
+    df["quantity"] = df["quantity"].to_numpy() / np.where(is_crude, TO_BARRELS, 1)
 
     return df
 
 
-def get_african_imports(df: pd.DataFrame, yearly: bool = False) -> pd.DataFrame:
-    """STEP 2: Filter for African imports"""
-    df = (
+def get_african_trade(df: pd.DataFrame, yearly: bool = False) -> pd.DataFrame:
+    """STEPS 2 and 3: Filter for African imports and exports. Export quantities are
+    negative. Only countries which both import and export a commodity are kept"""
+
+    imports = (
         df.pipe(_only_african_imports)
-        .groupby(
-            ["year", "importer", "category", "pink_sheet_commodity"],
-            as_index=False,
-        )
-        .sum(numeric_only=True)
+        .rename(columns={"importer": "iso_code"})[NET_IMPORTS_KEYS + ["quantity"]]
+        .assign(side="imports_quantity")
+    )
+    exports = (
+        df.pipe(_only_african_exports)
+        .rename(columns={"exporter": "iso_code"})[NET_IMPORTS_KEYS + ["quantity"]]
+        .assign(side="exports_quantity", quantity=lambda d: -1 * d.quantity)
     )
 
-    if not yearly:
-        df = df.pipe(_yearly_average, exclude=["year", "quantity"])
-
-    return df.rename(columns={"quantity": "imports_quantity", "importer": "iso_code"})
-
-
-def get_african_exports(df: pd.DataFrame, yearly: bool = False) -> pd.DataFrame:
-    """STEP 3: Filter for African exports"""
     df = (
-        df.pipe(_only_african_exports)
+        pd.concat([imports, exports], ignore_index=True)
         .groupby(
-            ["year", "exporter", "category", "pink_sheet_commodity"], as_index=False
-        )
-        .sum(numeric_only=True)
+            NET_IMPORTS_KEYS + ["side"], as_index=False, observed=True, sort=False
+        )["quantity"]
+        .sum()
     )
+
     if not yearly:
         df = df.pipe(_yearly_average, exclude=["year", "quantity"])
 
-    return df.assign(quantity=lambda d: -1 * d.quantity).rename(
-        columns={"quantity": "exports_quantity", "exporter": "iso_code"}
+    # The yearly average moves the year column last, keep the keys in frame order
+    keys = [c for c in df.columns if c in NET_IMPORTS_KEYS]
+
+    return (
+        df.set_index(keys + ["side"])["quantity"]
+        .unstack("side")
+        .dropna()
+        .sort_index()
+        .reset_index()
+        .rename_axis(columns=None)
+        .filter(keys + ["imports_quantity", "exports_quantity"], axis=1)
     )
 
 
-def calc_net_imports(
-    imports_df: pd.DataFrame, exports_df: pd.DataFrame, column_to_net: str = "quantity"
-) -> pd.DataFrame:
+def calc_net_imports(df: pd.DataFrame, column_to_net: str = "quantity") -> pd.DataFrame:
     """STEP 4: Calculate net imports"""
 
-    # Combine the dataframes
-    df = imports_df.merge(
-        exports_df, on=[x for x in imports_df.columns if x in exports_df.columns]
-    )
-
     # Calculate the net quantity
     return (
         df.assign(
@@ -193,29 +275,34 @@ def add_total_trade(
 ) -> pd.DataFrame:
     """ """
 
-    df["total_trade"] = df[import_column] + (df[export_column] * -1)
-    return df
+    return df.assign(total_trade=df[import_column] + (df[export_column] * -1))
+
+
+@lru_cache(maxsize=8)
+def _commodity_prices(commodities: tuple) -> pd.DataFrame:
+    """Commodity prices for a tuple of commodities"""
+    return get_commodity_prices(list(commodities))
 
 
 def get_yearly_prices_data(commodities_list: list) -> pd.DataFrame:
+    """Yearly average prices, in long format"""
+    prices = _commodity_prices(tuple(commodities_list))
+
     return (
-        get_commodity_prices(commodities_list)
-        .melt(id_vars=["period"], var_name="commodity")
-        .replace("…", np.nan, regex=True)
-        .astype({"value": float})
-        .assign(year=lambda d: d.period.dt.year)
-        .groupby(["year", "commodity"], as_index=False)
-        .mean(numeric_only=True)
+        prices.drop(columns="period")
+        .apply(pd.to_numeric, errors="coerce")
+        .groupby(prices.period.dt.year.rename("year"))
+        .mean()
+        .reset_index()
+        .melt(id_vars=["year"], var_name="commodity")
     )
 
 
 def get_latest_prices_data(commodities_list: list) -> dict:
     return (
-        get_commodity_prices(commodities_list)
-        .melt(id_vars=["period"], var_name="commodity")
-        .sort_values(["period", "commodity"])
-        .drop_duplicates(subset=["commodity"], keep="last")
-        .set_index("commodity")["value"]
+        _commodity_prices(tuple(commodities_list))
+        .pipe(lambda d: d.loc[d.period.idxmax()])
+        .drop("period")
         .to_dict()
     )
 
@@ -226,13 +313,37 @@ def get_spending(
     """Calculate spending for commodities for all variables,
     based on average yearly prices and latest prices"""
 
-    for column in units_columns:
-        df[f"value_{column}_{prices[0][0]}"] = df[column] * df.pink_sheet_commodity.map(
-            prices[0][1]
-        )
-        df[f"value_{column}_{prices[1][0]}"] = df[column] * df.pink_sheet_commodity.map(
-            prices[1][1]
-        )
+    # Look up each price once per commodity and gather by categorical code
+    commodity = pd.Categorical(df.pink_sheet_commodity)
+
+    # (commodities + 1, prices) table. The last row is NaN for missing commodities
+    price_table = np.column_stack(
+        [
+            commodity.categories.map(price_dict).to_numpy(dtype="float64")
+            for _, price_dict in prices
+        ]
+    )
+    price_table = np.vstack([price_table, np.full(len(prices), np.nan)])
+
+    # Multiply every units column by every price in one broadcast:
+    # (rows, units, 1) * (rows, 1, prices) -> (rows, units, prices)
+    units = df[units_columns].to_numpy(dtype="float64")
+    values = units[:, :, None] * price_table[commodity.codes][:, None, :]
+
+    new_columns = [
+        f"value_{column}_{name}" for column in units_columns for name, _ in prices
+    ]
+    df = pd.concat(
+        [
+            df,
+            pd.DataFrame(
+                values.reshape(len(df), len(new_columns)),
+                columns=new_columns,
+                index=df.index,
+            ),
+        ],
+        axis=1,
+    )
 
     return df.rename(
         columns={k: k.replace("_quantity", "") for k in df.columns if "value" in k}
@@ -245,24 +356,28 @@ def get_net_imports_africa(yearly: bool = False) -> None:
     # Read a clean version of the full dataset (quantities)
     df = read_filtered_grouped_data()
 
-    # African imports
-    afr_imp = get_african_imports(df, yearly=yearly)
+    # African imports and exports
+    df = get_african_trade(df, yearly=yearly)
 
-    # African exports
-    afr_exp = get_african_exports(df, yearly=yearly)
+    # Calculate net imports quantity
+    df = calc_net_imports(df, column_to_net="quantity")
 
-    # Combine imports and exports data and calculate net imports quantity
-    df = calc_net_imports(
-        imports_df=afr_imp, exports_df=afr_exp, column_to_net="quantity"
-    )
+    df.pipe(_from_categorical).to_feather(paths.output + r"/net_imports_africa.feather")
 
-    df.to_feather(paths.output + r"/net_imports_africa.feather")
 
+def read_net_imports_africa() -> pd.DataFrame:
+    """Read the net imports dataset created by get_net_imports_africa"""
+    return pd.read_feather(paths.output + r"/net_imports_africa.feather")
 
-def _commodity_evolution_df(commodity: str, exports: bool = False) -> pd.DataFrame:
-    """Steps to get the change for a slope chart on Flourish"""
 
-    df = pd.read_feather(paths.output + r"/net_imports_africa.feather")
+def _commodity_evolution_df(
+    commodity: str, exports: bool = False, df: pd.DataFrame = None
+) -> pd.DataFrame:
+    """Steps to get the change for a slope chart on Flourish. The net imports data
+    is read from disk if it is not passed"""
+
+    if df is None:
+        df = read_net_imports_africa()
 
     # filter for crude
     df = df.loc[
@@ -289,37 +404,22 @@ def _commodity_evolution_df(commodity: str, exports: bool = False) -> pd.DataFra
         prices=[("pre_crisis", mean_18_20_prices), ("latest", latest_prices)],
     )
 
-    if exports:
-        df = df.assign(
-            value_net_exports_impact=lambda d: d.value_net_exports_latest
-            - d.value_net_exports_pre_crisis
-        )
-    else:
-        df = df.assign(
-            value_net_imports_impact=lambda d: d.value_net_imports_latest
-            - d.value_net_imports_pre_crisis
-        )
-
-    # Calculate spending by population
+    # Add the impact and spending by population in a single assignment
     col = "value_net_exports" if exports else "value_net_imports"
+    per_capita = "value_exp" if exports else "value_imp"
 
-    df = df.pipe(utils.add_population).assign(
-        value_exp_pre_pp=lambda d: d[f"{col}_pre_crisis"] / d.population,
-        value_exp_latest_pp=lambda d: d[f"{col}_latest"] / d.population,
-    )
+    df = df.pipe(utils.add_population)
 
-    if not exports:
-        df = df.rename(
-            columns={
-                "value_exp_pre_pp": "value_imp_pre_pp",
-                "value_exp_latest_pp": "value_imp_latest_pp",
-            }
-        )
+    pre = df[f"{col}_pre_crisis"].to_numpy()
+    latest = df[f"{col}_latest"].to_numpy()
+    population = df.population.to_numpy(dtype="float64")
+
+    df[[f"{col}_impact", f"{per_capita}_pre_pp", f"{per_capita}_latest_pp"]] = (
+        np.column_stack([latest - pre, pre / population, latest / population])
+    )
 
     # Clean for export
-    return df.assign(
-        country=lambda d: coco.convert(d.iso_code, to="short_name")
-    ).filter(
+    return df.assign(country=lambda d: _country_names(d.iso_code)).filter(
         [
             "country",
             "iso_code",
@@ -339,25 +439,33 @@ def _commodity_evolution_df(commodity: str, exports: bool = False) -> pd.DataFra
     )
 
 
-def crude_evolution_chart() -> None:
+def _rescale(df: pd.DataFrame, scales: dict, decimals: dict = None) -> pd.DataFrame:
+    """Divide columns by their scale and round them. Columns are rounded to 1 decimal
+    unless specified in decimals"""
+    columns = list(scales)
+
+    df[columns] = df[columns].to_numpy() / np.array(list(scales.values()))
+
+    return df.round(dict.fromkeys(columns, 1) | (decimals or {}))
+
+
+def crude_evolution_chart(data: pd.DataFrame = None) -> None:
     """A Flourish chart to visualise additional revenue from net crude exports, for
     selected countries"""
     df = (
-        _commodity_evolution_df("Crude oil, average", exports=True)
+        _commodity_evolution_df("Crude oil, average", exports=True, df=data)
         .loc[lambda d: d.iso_code.isin(CRUDE_COUNTRIES)]
         .drop("iso_code", axis=1)
-        .assign(
-            net_exports_quantity=lambda d: round(d.net_exports_quantity / 1e6, 0),
-            value_net_exports_pre_crisis=lambda d: round(
-                d.value_net_exports_pre_crisis / 1e9, 1
-            ),
-            value_net_exports_latest=lambda d: round(
-                d.value_net_exports_latest / 1e9, 1
-            ),
-            value_net_exports_impact=lambda d: round(
-                d.value_net_exports_impact / 1e9, 1
-            ),
-            value_exp_latest_pp=lambda d: round(d.value_exp_latest_pp, 1),
+        .pipe(
+            _rescale,
+            scales={
+                "net_exports_quantity": 1e6,
+                "value_net_exports_pre_crisis": 1e9,
+                "value_net_exports_latest": 1e9,
+                "value_net_exports_impact": 1e9,
+                "value_exp_latest_pp": 1,
+            },
+            decimals={"net_exports_quantity": 0},
         )
         .rename(
             columns={
@@ -378,28 +486,24 @@ def _flourish_commodity_pipeline(
     quantity_unit: str = "tonnes",
     quantity_rounding: float = 1,
     value_rounding: float = 1,
+    data: pd.DataFrame = None,
 ) -> pd.DataFrame:
     df = (
-        _commodity_evolution_df(commodity, exports=False)
+        _commodity_evolution_df(commodity, exports=False, df=data)
         .assign(commodity=commodity)
         .drop("iso_code", axis=1)
     )
 
-    return df.assign(
-        net_imports_quantity=lambda d: round(
-            d.net_imports_quantity / quantity_rounding, 1
-        ),
-        value_net_imports_pre_crisis=lambda d: round(
-            d.value_net_imports_pre_crisis / value_rounding, 1
-        ),
-        value_net_imports_latest=lambda d: round(
-            d.value_net_imports_latest / value_rounding, 1
-        ),
-        value_net_imports_impact=lambda d: round(
-            d.value_net_imports_impact / value_rounding, 1
-        ),
-        value_imp_pre_pp=lambda d: round(d.value_imp_pre_pp, 1),
-        value_imp_latest_pp=lambda d: round(d.value_imp_latest_pp, 1),
+    return df.pipe(
+        _rescale,
+        scales={
+            "net_imports_quantity": quantity_rounding,
+            "value_net_imports_pre_crisis": value_rounding,
+            "value_net_imports_latest": value_rounding,
+            "value_net_imports_impact": value_rounding,
+            "value_imp_pre_pp": 1,
+            "value_imp_latest_pp": 1,
+        },
     ).rename(
         columns={
             "net_imports_quantity": f"Net imports ({quantity_unit})",
@@ -412,21 +516,20 @@ def _flourish_commodity_pipeline(
     )
 
 
-def vegetable_oils_chart() -> None:
+def vegetable_oils_chart(data: pd.DataFrame = None) -> None:
     """A Flourish chart to visualise the change in cost (in usd million and per capita)
     for palm and sunflower oils"""
 
-    palm_oil = _flourish_commodity_pipeline(
-        "Palm oil",
-        value_rounding=1e6,
-    )
-    sunflower_oil = _flourish_commodity_pipeline(
-        "Sunflower oil",
-        value_rounding=1e6,
-    )
+    if data is None:
+        data = read_net_imports_africa()
+
+    oils = [
+        _flourish_commodity_pipeline(commodity, value_rounding=1e6, data=data)
+        for commodity in ["Palm oil", "Sunflower oil"]
+    ]
 
     df = (
-        pd.concat([palm_oil, sunflower_oil], ignore_index=True)
+        pd.concat(oils, ignore_index=True)
         .loc[lambda d: d.country != "Djibouti"]
         .groupby(["country"], as_index=False)
         .sum(numeric_only=True)
@@ -452,19 +555,22 @@ def vegetable_oils_chart() -> None:
     df.to_csv(paths.output + r"/vegetable_oils_chart.csv", index=False)
 
 
-def grains_chart() -> None:
+def grains_chart(data: pd.DataFrame = None) -> None:
     """A Flourish chart to visualise the change in cost (in usd million and per capita)
     for wheat and maize"""
 
-    wheat = _flourish_commodity_pipeline(
-        "Wheat", value_rounding=1e9, quantity_rounding=1e6
-    )
-    maize = _flourish_commodity_pipeline(
-        "Maize", value_rounding=1e9, quantity_rounding=1e6
-    )
+    if data is None:
+        data = read_net_imports_africa()
+
+    grains = [
+        _flourish_commodity_pipeline(
+            commodity, value_rounding=1e9, quantity_rounding=1e6, data=data
+        )
+        for commodity in ["Wheat", "Maize"]
+    ]
 
     grain = (
-        pd.concat([wheat, maize], ignore_index=True)
+        pd.concat(grains, ignore_index=True)
         .groupby(["country"], as_index=False)
         .sum(numeric_only=True)
         .filter(["country", "Pre-war average", "At current prices"], axis=1)
@@ -490,9 +596,10 @@ def grains_chart() -> None:
     grain_pre_post.to_csv(paths.output + r"/grain_chart_pre_post.csv", index=False)
 
 
-def analysis_pipeline():
+def analysis_pipeline(data: pd.DataFrame = None):
     # Combine imports and exports data and calculate net imports quantity
-    data = pd.read_feather(paths.output + r"/net_imports_africa.feather")
+    if data is None:
+        data = read_net_imports_africa()
 
     # Add total trade
     data = data.pipe(add_total_trade)
@@ -528,17 +635,20 @@ def analysis_pipeline():
     # STEP 7: Add other categorical information about countries
 
     data = (
-        data.pipe(utils.add_ppp, usd_values_col="value_imports_pre_crisis")
-        .pipe(utils.add_ppp, usd_values_col="value_imports_latest")
-        .pipe(utils.add_ppp, usd_values_col="value_exports_pre_crisis")
-        .pipe(utils.add_ppp, usd_values_col="value_exports_latest")
-        .pipe(utils.add_ppp, usd_values_col="value_net_imports_pre_crisis")
-        .pipe(utils.add_ppp, usd_values_col="value_net_imports_latest")
-        .pipe(utils.add_ppp, usd_values_col="net_imports_impact_value")
-        .pipe(utils.add_population)
-        .pipe(utils.add_gdp)
-        .pipe(utils.add_income_levels)
-        .assign(country=lambda d: coco.convert(d.iso_code, to="short_name"))
+        data.pipe(
+            utils.add_ppp,
+            usd_values_col=[
+                "value_imports_pre_crisis",
+                "value_imports_latest",
+                "value_exports_pre_crisis",
+                "value_exports_latest",
+                "value_net_imports_pre_crisis",
+                "value_net_imports_latest",
+                "net_imports_impact_value",
+            ],
+        )
+        .pipe(utils.add_country_attributes, ["population", "gdp", "income_level"])
+        .assign(country=lambda d: _country_names(d.iso_code))
     )
 
     # STEP 8: Reshape for analysis
@@ -557,19 +667,23 @@ def analysis_pipeline():
     return data
 
 
-def update_trade_impact_charts() -> None:
+def update_trade_impact_charts(data: pd.DataFrame = None) -> None:
     """Update trade impact charts for Flourish"""
 
-    crude_evolution_chart()
-    grains_chart()
-    vegetable_oils_chart()
+    if data is None:
+        data = read_net_imports_africa()
+
+    crude_evolution_chart(data)
+    grains_chart(data)
+    vegetable_oils_chart(data)
 
 
 def update_all_trade() -> None:
-    update_trade_impact_charts()
-    analysis = analysis_pipeline()
+    data = read_net_imports_africa()
+
+    update_trade_impact_charts(data)
+    analysis = analysis_pipeline(data)
     analysis.to_csv(paths.output + r"/data_for_analysis.csv", index=False)
-    crude_evolution_chart()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,18 @@
 """ """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 import wbgapi as wb
 import weo
+from pandas.api.extensions import take
 from scripts import config
 
+# Loaders decorated with lru_cache return shared objects, do not modify them in place
+
 # =============================================================================
 #  Parameters
 # =============================================================================
@@ -13,6 +21,37 @@ WEO_YEAR: int = 2022
 WEO_RELEASE: int = 1
 GDP_YEAR: int = 2021
 
+# Thousands separators and missing value dashes stripped from WEO values
+_WEO_STRIP: dict = str.maketrans("", "", ",-")
+
+
+# =============================================================================
+#  lookups
+# =============================================================================
+
+
+def map_unique(values: pd.Series, lookup) -> np.ndarray | pd.DataFrame:
+    """Look up the unique values of a column and broadcast the results back to every
+    row. The lookup is a dict or series, or a function of the unique values. If the
+    function returns a DataFrame, its columns are returned as a DataFrame"""
+    positions, uniques = pd.factorize(values)
+
+    if callable(lookup):
+        mapped = lookup(uniques)
+    else:
+        mapped = pd.Series(uniques).map(lookup).to_numpy()
+
+    if isinstance(mapped, pd.DataFrame):
+        return pd.DataFrame(
+            {
+                column: take(mapped[column].to_numpy(), positions, allow_fill=True)
+                for column in mapped.columns
+            },
+            index=values.index,
+        )
+
+    return take(np.asarray(mapped), positions, axis=0, allow_fill=True)
+
 
 # =============================================================================
 #  population
@@ -34,10 +73,9 @@ def get_wb_indicator(indicator: str) -> pd.DataFrame:
         raise ConnectionError(f"Could not retrieve indicator {indicator}")
 
 
-def wb_indicator_to_dict(df: pd.DataFrame, indicator_col: str):
-    """converts a wb series to a dictionary where keys are iso3 codes and values
-    are indicator values"""
-    return df[indicator_col].astype("int32").to_dict()
+def wb_indicator_to_series(df: pd.DataFrame, indicator_col: str) -> pd.Series:
+    """converts a wb indicator to a series indexed by iso3 codes"""
+    return df[indicator_col].astype("int32")
 
 
 def update_wb_indicator(id_: str) -> None:
@@ -45,26 +83,22 @@ def update_wb_indicator(id_: str) -> None:
     get_wb_indicator(id_).to_csv(config.paths.raw_data + rf"/{id_}.csv", index=True)
 
 
-def add_population(df: pd.DataFrame, iso_codes_col: str = "iso_code") -> pd.DataFrame:
-    """Adds population to a dataframe"""
-
-    id_ = "SP.POP.TOTL"
-    pop_: dict = pd.read_csv(
+@lru_cache(maxsize=8)
+def _read_wb_indicator(id_: str) -> pd.DataFrame:
+    """Read a saved wb indicator, indexed by iso3 code"""
+    return pd.read_csv(
         config.paths.raw_data + rf"/{id_}.csv", dtype={f"{id_}": float}, index_col=0
-    ).pipe(wb_indicator_to_dict, id_)
-
-    return df.assign(population=lambda d: d[iso_codes_col].map(pop_))
+    )
 
 
-def add_health_pc(df: pd.DataFrame, iso_codes_col: str = "iso_code") -> pd.DataFrame:
+def add_population(df: pd.DataFrame, iso_codes_col: str = "iso_code") -> pd.DataFrame:
     """Adds population to a dataframe"""
+    return add_country_attributes(df, ["population"], iso_codes_col=iso_codes_col)
 
-    id_ = "SH.XPD.GHED.PC.CD"
-    pop_: dict = pd.read_csv(
-        config.paths.raw_data + rf"/{id_}.csv", dtype={f"{id_}": float}, index_col=0
-    ).pipe(wb_indicator_to_dict, id_)
 
-    return df.assign(health_spending=lambda d: d[iso_codes_col].map(pop_))
+def add_health_pc(df: pd.DataFrame, iso_codes_col: str = "iso_code") -> pd.DataFrame:
+    """Adds health spending per capita to a dataframe"""
+    return add_country_attributes(df, ["health_spending"], iso_codes_col=iso_codes_col)
 
 
 def get_debt_service(year: int = 2022) -> dict:
@@ -89,7 +123,11 @@ def get_debt_service(year: int = 2022) -> dict:
 
 
 def _download_weo(year: int, release: int) -> None:
-    """Downloads WEO as a csv to glossaries folder as "weo_month_year.csv"""
+    """Downloads WEO as a csv to glossaries folder as "weo_month_year.csv", together
+    with a clean parquet version. A release is only downloaded once"""
+
+    if os.path.exists(f"{config.paths.raw_data}/weo_{year}_{release}.csv"):
+        return
 
     try:
         weo.download(
@@ -101,6 +139,8 @@ def _download_weo(year: int, release: int) -> None:
     except ConnectionError:
         raise ConnectionError("Could not download weo data")
 
+    _save_weo_parquet(year=year, release=release)
+
 
 def _clean_weo(df: pd.DataFrame) -> pd.DataFrame:
     """cleans and formats weo dataframe"""
@@ -119,38 +159,51 @@ def _clean_weo(df: pd.DataFrame) -> pd.DataFrame:
         "Country/Series-specific Notes",
         "Estimates Start After",
     ]
-    return (
+
+    # The melted frame is new, so the columns are converted on it in place
+    df = (
         df.drop(cols_to_drop, axis=1)
         .rename(columns=columns)
         .melt(id_vars=columns.values(), var_name="year", value_name="value")
-        .assign(
-            value=lambda d: d.value.map(
-                lambda x: str(x).replace(",", "").replace("-", "")
-            )
-        )
-        .astype({"year": "int32"})
-        .assign(value=lambda d: pd.to_numeric(d.value, errors="coerce"))
+    )
+    df["year"] = df["year"].astype("int32")
+    df["value"] = pd.to_numeric(
+        df["value"].astype(str).str.translate(_WEO_STRIP), errors="coerce"
+    )
+
+    return df
+
+
+def _save_weo_parquet(year: int, release: int) -> None:
+    """Saves a clean (long) version of a downloaded WEO release as parquet"""
+
+    file = f"{config.paths.raw_data}/weo_{year}_{release}"
+
+    weo.WEO(f"{file}.csv").df.pipe(_clean_weo).to_parquet(
+        f"{file}.parquet", compression="zstd", index=False
     )
 
 
-def get_gdp(gdp_year: int) -> dict:
+@lru_cache(maxsize=8)
+def get_gdp(gdp_year: int) -> pd.Series:
     """
-    Retrieves gdp value for a specific year
+    Retrieves gdp value for a specific year, indexed by iso3 code
     """
+    file = f"{config.paths.raw_data}/weo_{WEO_YEAR}_{WEO_RELEASE}.parquet"
 
-    # Read the weo data
-    df = weo.WEO(f"{config.paths.raw_data}/weo_{WEO_YEAR}_{WEO_RELEASE}.csv").df
+    if not os.path.exists(file):
+        _save_weo_parquet(year=WEO_YEAR, release=WEO_RELEASE)
 
-    # Clean the weo data. Filter for GDP, convert to USD. Return as dictionary
+    # Read only GDP for the requested year, convert to USD. Return as a series
     return (
-        df.pipe(_clean_weo)
-        .loc[
-            lambda d: (d.indicator == "NGDPD") & (d.year == gdp_year),
-            ["iso_code", "value"],
-        ]
-        .assign(gdp=lambda d: d.value * 1e9)
-        .set_index("iso_code")["gdp"]
-        .to_dict()
+        pd.read_parquet(
+            file,
+            columns=["iso_code", "value"],
+            filters=[("indicator", "==", "NGDPD"), ("year", "==", gdp_year)],
+        )
+        .set_index("iso_code")["value"]
+        .mul(1e9)
+        .rename("gdp")
     )
 
 
@@ -159,9 +212,7 @@ def add_gdp(
     iso_codes_col: str = "iso_code",
 ) -> pd.DataFrame:
     """adds gdp to a dataframe"""
-    gdp: dict = get_gdp(gdp_year=GDP_YEAR)
-
-    return df.assign(gdp=lambda d: d[iso_codes_col].map(gdp))
+    return add_country_attributes(df, ["gdp"], iso_codes_col=iso_codes_col)
 
 
 # =============================================================================
@@ -186,19 +237,59 @@ def _download_income_levels():
     print("Downloaded income levels")
 
 
-def get_income_levels() -> dict:
-    """Return income level dictionary"""
+@lru_cache(maxsize=1)
+def get_income_levels() -> pd.Series:
+    """Return income levels indexed by iso3 code"""
     file = config.paths.raw_data + r"/income_levels.csv"
-    return pd.read_csv(file, na_values=None, index_col="Code")["Income group"].to_dict()
+    return pd.read_csv(file, na_values=None, index_col="Code")["Income group"]
 
 
 def add_income_levels(
     df: pd.DataFrame, iso_codes_col: str = "iso_code"
 ) -> pd.DataFrame:
     """Add income levels to a dataframe"""
-    income_levels: dict = get_income_levels()
+    return add_country_attributes(df, ["income_level"], iso_codes_col=iso_codes_col)
 
-    return df.assign(income_level=lambda d: d[iso_codes_col].map(income_levels))
+
+# =============================================================================
+#  country attributes
+# =============================================================================
+
+# Loaders for the country level attributes, keyed by the column they are added as.
+# Each returns a series indexed by iso3 code (the loaders themselves are cached)
+COUNTRY_ATTRIBUTES = {
+    "population": lambda: wb_indicator_to_series(
+        _read_wb_indicator("SP.POP.TOTL"), "SP.POP.TOTL"
+    ),
+    "health_spending": lambda: wb_indicator_to_series(
+        _read_wb_indicator("SH.XPD.GHED.PC.CD"), "SH.XPD.GHED.PC.CD"
+    ),
+    "gdp": lambda: get_gdp(gdp_year=GDP_YEAR),
+    "income_level": get_income_levels,
+}
+
+
+def add_country_attributes(
+    df: pd.DataFrame,
+    attributes: list[str] | tuple[str, ...] = ("population", "gdp", "income_level"),
+    iso_codes_col: str = "iso_code",
+) -> pd.DataFrame:
+    """Add country attributes to a dataframe. Attributes which are already columns
+    of the dataframe are left as they are"""
+    attributes = [a for a in attributes if a not in df.columns]
+
+    if not attributes:
+        return df
+
+    # Look up all the attributes for the unique iso codes in one pass
+    found = map_unique(
+        df[iso_codes_col],
+        lambda iso_codes: pd.DataFrame(
+            {a: COUNTRY_ATTRIBUTES[a]().reindex(iso_codes) for a in attributes}
+        ),
+    )
+
+    return df.assign(**{attribute: found[attribute] for attribute in attributes})
 
 
 # =============================================================================
@@ -206,39 +297,63 @@ def add_income_levels(
 # =============================================================================
 
 
+def _lcu_ppp() -> pd.Series:
+    """GDP conversion factor for LCU to International USD (PPP), by iso3 code"""
+    id_ = "PA.NUS.PPP"
+    return _read_wb_indicator(id_)[id_]
+
+
+def _lcu_usd() -> pd.Series:
+    """Official exchange rate (LCU per US$, period average), by iso3 code"""
+    id_ = "PA.NUS.FCRF"
+    return _read_wb_indicator(id_)[id_]
+
+
+@lru_cache(maxsize=1)
+def _ppp_rates() -> pd.DataFrame:
+    """Exchange rate and PPP conversion factor, by iso3 code"""
+    return pd.concat([_lcu_usd(), _lcu_ppp()], axis=1)
+
+
 def add_ppp(
-    df: pd.DataFrame, iso_codes_col: str = "iso_code", usd_values_col: str = "value"
+    df: pd.DataFrame,
+    iso_codes_col: str = "iso_code",
+    usd_values_col: str | list[str] = "value",
 ) -> pd.DataFrame:
-    """Adds PPP values to a dataframe"""
+    """Adds PPP values to a dataframe, for one or more USD value columns"""
 
-    # GDP conversion factor for LCU to International USD (PPP)
-    lcu_ppp_id = "PA.NUS.PPP"
-    lcu_ppp: dict = pd.read_csv(config.paths.raw_data + rf"/{lcu_ppp_id}.csv").pipe(
-        wb_indicator_to_dict, lcu_ppp_id
-    )
+    if isinstance(usd_values_col, str):
+        usd_values_col = [usd_values_col]
 
-    # Official exchange rate (LCU per US$, period average)
-    lcu_usd_id = "PA.NUS.FCRF"
-    lcu_usd: dict = pd.read_csv(config.paths.raw_data + rf"/{lcu_usd_id}.csv").pipe(
-        wb_indicator_to_dict, lcu_usd_id
+    # Look up both rates together, as a (rows, 2) array
+    rates = map_unique(
+        df[iso_codes_col], lambda iso_codes: _ppp_rates().reindex(iso_codes).to_numpy()
     )
 
-    df[f"{usd_values_col}_ppp"] = (
-        df[usd_values_col] * df[iso_codes_col].map(lcu_usd)
-    ) / df[iso_codes_col].map(lcu_ppp)
+    # Convert all columns in one broadcast over the (rows, columns) array
+    values = df[usd_values_col].to_numpy(dtype="float64")
+    converted = (values * rates[:, [0]]) / rates[:, [1]]
+
+    df[[f"{column}_ppp" for column in usd_values_col]] = converted
 
     return df
 
 
 if __name__ == "__main__":
-    _download_income_levels()
-    _download_weo(year=WEO_YEAR, release=WEO_RELEASE)
-    update_wb_indicator(id_="SP.POP.TOTL")
-    update_wb_indicator(id_="PA.NUS.PPP")
-    update_wb_indicator(id_="PA.NUS.FCRF")
-
-    # Education
-    update_wb_indicator(id_="SE.XPD.TOTL.GD.ZS")
+    # The downloads are independent and network bound, so they run concurrently.
+    # Results are collected so that any failed download still raises
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        downloads = [
+            executor.submit(_download_income_levels),
+            executor.submit(_download_weo, year=WEO_YEAR, release=WEO_RELEASE),
+            executor.submit(update_wb_indicator, id_="SP.POP.TOTL"),
+            executor.submit(update_wb_indicator, id_="PA.NUS.PPP"),
+            executor.submit(update_wb_indicator, id_="PA.NUS.FCRF"),
+            # Education
+            executor.submit(update_wb_indicator, id_="SE.XPD.TOTL.GD.ZS"),
+            # Health per capita
+            executor.submit(update_wb_indicator, id_="SH.XPD.GHED.PC.CD"),
+        ]
 
-    # Health per capita
-    update_wb_indicator(id_="SH.XPD.GHED.PC.CD")
+    for download in downloads:
+        download.result()
@@ -6,15 +6,12 @@ from scripts.trade_impact import update_all_trade
 
 
 def last_updated():
-    from csv import writer
     from scripts import config
     import datetime
 
-    with open(config.paths.output + r"/updates.csv", "a+", newline="") as file:
-        # Create a writer object from csv module
-        csv_writer = writer(file)
-        # Add contents of list as last row in the csv file
-        csv_writer.writerow([datetime.datetime.today()])
+    with open(config.paths.output + r"/updates.csv", "a", newline="") as file:
+        # Add the update time as the last row, with the csv line ending used so far
+        file.write(f"{datetime.datetime.today()}\r\n")
 
 
 if __name__ == "__main__":